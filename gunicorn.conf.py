@@ -0,0 +1,22 @@
+"""
+Configuration gunicorn de l'API (chargée via `gunicorn -c gunicorn.conf.py`)
+Les métriques Prometheus sont agrégées entre les workers en mode multiprocess
+"""
+
+import os
+import shutil
+
+# Répertoire partagé des métriques Prometheus (un fichier par worker), vidé à
+# chaque démarrage. Doit exister avant l'import de main.py (--preload) et de
+# prometheus_client, qui choisit son stockage à l'import.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc"
+)
+shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Marque le worker terminé pour que ses métriques live ne soient plus agrégées"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,18 +1,25 @@
+import os
+
+# Threads natifs (OpenMP/BLAS) par worker, fixés AVANT l'import de numpy/sklearn:
+# évite la sur-souscription quand plusieurs workers tournent en parallèle
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+THREADS_PER_WORKER = max(1, (os.cpu_count() or 1) // WORKERS)
+os.environ.setdefault("OMP_NUM_THREADS", str(THREADS_PER_WORKER))
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, JSONResponse
 from pydantic import BaseModel, Field, validator
-from typing import List, Dict, Any, Optional, Union
-import mlflow
-from mlflow.tracking import MlflowClient
+from typing import List, Dict, Any, Optional, Tuple, Union
 import pandas as pd
 import numpy as np
-import os
 from datetime import datetime
+from functools import lru_cache
 import logging
 import joblib
 import pickle
+import sklearn
 import warnings
 import time
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
@@ -22,8 +29,7 @@ from prometheus_fastapi_instrumentator import Instrumentator
 warnings.filterwarnings('ignore')
 
 # ==================== CONFIGURATION ====================
-MLFLOW_TRACKING_URI = "sqlite:///mlflow.db"
-mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
+_SKLEARN_VERSION = sklearn.__version__
 
 # Chemin vers le modèle dans Docker - essayer plusieurs emplacements
 MODEL_PATHS = [
@@ -32,11 +38,106 @@ MODEL_PATHS = [
     "/app/mlruns",  # Fallback vers mlruns
 ]
 
+# Nombre de prédictions individuelles gardées en cache (LRU)
+PREDICTION_CACHE_SIZE = 10_000
+
+# Taille minimale (octets) au-delà de laquelle le modèle est chargé en mmap
+MMAP_MIN_SIZE = 1024 * 1024
+
+# Colonnes d'entrée du modèle (format ORIGINAL, ordre des champs de l'API)
+COLUMN_ORDER = [
+    "Duration in month",
+    "Credit amount",
+    "Installment rate in percentage of disposable income",
+    "Age in years",
+    "Number of existing credits at this bank",
+    "Number of people being liable to provide maintenance for",
+    "Status of existing checking account",
+    "Credit history",
+    "Savings account/bonds",
+    "Present employment since",
+    "Job",
+    "Purpose",
+    "Personal status and sex",
+    "Other debtors / guarantors",
+    "Property",
+    "Other installment plans",
+    "Housing",
+    "Telephone",
+    "foreign worker"
+]
+
+# Colonnes nominales (one-hot dans le pipeline)
+NOMINAL_COLUMNS = COLUMN_ORDER[11:]
+
+# Codes connus (German Credit) des colonnes nominales
+NOMINAL_CATEGORIES = {
+    "Purpose": ["A40", "A41", "A42", "A43", "A44", "A45", "A46", "A47", "A48", "A49", "A410"],
+    "Personal status and sex": ["A91", "A92", "A93", "A94", "A95"],
+    "Other debtors / guarantors": ["A101", "A102", "A103"],
+    "Property": ["A121", "A122", "A123", "A124"],
+    "Other installment plans": ["A141", "A142", "A143"],
+    "Housing": ["A151", "A152", "A153"],
+    "Telephone": ["A191", "A192"],
+    "foreign worker": ["A201", "A202"],
+}
+
+# Types explicites pour éviter l'inférence de dtype à chaque construction
+COLUMN_DTYPES = {
+    "Duration in month": "int64",
+    "Credit amount": "float64",
+    "Installment rate in percentage of disposable income": "int64",
+    "Age in years": "int64",
+    "Number of existing credits at this bank": "int64",
+    "Number of people being liable to provide maintenance for": "int64",
+    **{col: "object" for col in COLUMN_ORDER[6:11]},
+    # Catégories fixes pour les nominales: le one-hot (get_dummies, drop_first)
+    # est alors identique quel que soit le contenu du batch, même pour 1 ligne
+    **{col: pd.CategoricalDtype(NOMINAL_CATEGORIES[col]) for col in NOMINAL_COLUMNS}
+}
+
+
+
+def build_dataframe(rows: List[Union[tuple, Dict[str, Any]]]) -> pd.DataFrame:
+    """Construit le DataFrame d'entrée du modèle (ordre COLUMN_ORDER, dtypes COLUMN_DTYPES)"""
+    return pd.DataFrame.from_records(rows, columns=COLUMN_ORDER).astype(COLUMN_DTYPES)
+
+# Tester le modèle au chargement (désactivé par défaut: coûte une inférence
+# au démarrage et à chaque /api/reload-model)
+TEST_MODEL_ON_LOAD = os.getenv("TEST_MODEL_ON_LOAD", "0") == "1"
+
+# Demande factice pour ModelCache._test_model (construite une seule fois)
+TEST_APPLICATION = {
+    "Duration in month": 12,
+    "Credit amount": 5000.0,
+    "Installment rate in percentage of disposable income": 2,
+    "Age in years": 35,
+    "Number of existing credits at this bank": 1,
+    "Number of people being liable to provide maintenance for": 1,
+    "Status of existing checking account": "A12",
+    "Credit history": "A32",
+    "Savings account/bonds": "A61",
+    "Present employment since": "A73",
+    "Job": "A173",
+    "Purpose": "A43",
+    "Personal status and sex": "A93",
+    "Other debtors / guarantors": "A101",
+    "Property": "A121",
+    "Other installment plans": "A143",
+    "Housing": "A152",
+    "Telephone": "A192",
+    "foreign worker": "A201"
+}
+TEST_DATAFRAME = build_dataframe([TEST_APPLICATION])
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # ==================== FASTAPI APP ====================
+# Pas de default_response_class personnalisée (ex: ORJSONResponse): avec un
+# response_model, FastAPI >= 0.130 sérialise directement en JSON via le coeur
+# Rust de Pydantic, et une classe personnalisée désactiverait ce chemin.
 app = FastAPI(
     title="Credit Score ML API",
     description="API de production pour prédiction de crédit avec MLflow",
@@ -55,6 +156,10 @@ app.add_middleware(
 )
 
 # ==================== PROMETHEUS METRICS ====================
+# Avec plusieurs workers gunicorn, PROMETHEUS_MULTIPROC_DIR est défini par
+# gunicorn.conf.py: chaque worker écrit ses valeurs dans ce répertoire et
+# /metrics (Instrumentator) les agrège via MultiProcessCollector.
+
 # Métriques personnalisées
 prediction_counter = Counter(
     'credit_predictions_total',
@@ -86,7 +191,8 @@ model_load_counter = Counter(
 
 active_models = Gauge(
     'active_models_total',
-    'Nombre de modèles actuellement chargés'
+    'Nombre de modèles actuellement chargés',
+    multiprocess_mode='livemax'
 )
 
 api_request_errors = Counter(
@@ -95,8 +201,19 @@ api_request_errors = Counter(
     ['endpoint', 'error_type']
 )
 
+# Compteurs labellisés pré-résolus (évite un .labels() par prédiction)
+PRED_SINGLE_OK = prediction_counter.labels(prediction_type='single', status='success')
+PRED_SINGLE_ERR = prediction_counter.labels(prediction_type='single', status='error')
+PRED_BATCH_OK = prediction_counter.labels(prediction_type='batch', status='success')
+PRED_BATCH_ERR = prediction_counter.labels(prediction_type='batch', status='error')
+
 # Instrumenter FastAPI avec prometheus-fastapi-instrumentator
-Instrumentator().instrument(app).expose(app)
+# (sans les endpoints scrapés en continu: /metrics, health check, page d'accueil)
+Instrumentator(
+    excluded_handlers=["^/metrics$", "^/api/health$", "^/$"],  # regex
+    should_group_status_codes=True,
+    should_instrument_requests_inprogress=False
+).instrument(app).expose(app, include_in_schema=False)
 
 
 # ==================== MODELS PYDANTIC ====================
@@ -170,9 +287,9 @@ class CreditApplicationInput(BaseModel):
             }
         }
     
-    def to_dataframe(self) -> pd.DataFrame:
-        """Convertit l'input en DataFrame avec les noms de colonnes originaux"""
-        data = {
+    def to_row_dict(self) -> Dict[str, Any]:
+        """Convertit l'input en dict avec les noms de colonnes originaux"""
+        return {
             "Duration in month": self.duration_in_month,
             "Credit amount": self.credit_amount,
             "Installment rate in percentage of disposable income": self.installment_rate,
@@ -193,7 +310,17 @@ class CreditApplicationInput(BaseModel):
             "Telephone": self.telephone,
             "foreign worker": self.foreign_worker
         }
-        return pd.DataFrame([data])
+
+    def to_key(self) -> tuple:
+        """Tuple hashable des 19 champs (ordre COLUMN_ORDER), clé du cache de prédictions"""
+        return (
+            self.duration_in_month, self.credit_amount, self.installment_rate,
+            self.age_in_years, self.num_existing_credits, self.num_dependents,
+            self.status_checking_account, self.credit_history, self.savings_account,
+            self.employment_since, self.job, self.purpose, self.personal_status_sex,
+            self.other_debtors, self.property, self.other_installment_plans,
+            self.housing, self.telephone, self.foreign_worker
+        )
 
 
 class PredictionResponse(BaseModel):
@@ -241,26 +368,37 @@ class ModelCache:
     def __init__(self):
         self.model = None
         self.model_path = None
+        # Chemin résolu par find_model_file (invalidé par /api/reload-model)
+        self._resolved_path = None
         self.model_version = "local-docker"
         self.load_method = None
+        # Méthodes liées capturées au chargement (évite les lookups par requête)
+        self.predict = None
+        self.predict_proba = None
         
     def find_model_file(self):
         """Trouve le fichier modèle dans différents emplacements"""
+        if self._resolved_path and os.path.exists(self._resolved_path):
+            return self._resolved_path
+        
         for path in MODEL_PATHS:
             if os.path.exists(path):
                 if os.path.isfile(path):
                     logger.info(f"✅ Fichier modèle trouvé: {path}")
+                    self._resolved_path = path
                     return path
                 elif os.path.isdir(path):
                     # Chercher model.pkl dans le dossier
                     pkl_path = os.path.join(path, "model.pkl")
                     if os.path.exists(pkl_path):
                         logger.info(f"✅ Fichier modèle trouvé: {pkl_path}")
+                        self._resolved_path = pkl_path
                         return pkl_path
                     # Chercher un dossier MLflow model
                     mlmodel_path = os.path.join(path, "MLmodel")
                     if os.path.exists(mlmodel_path):
                         logger.info(f"✅ Dossier MLflow model trouvé: {path}")
+                        self._resolved_path = path
                         return path
                     # Lister le contenu
                     contents = os.listdir(path)
@@ -280,37 +418,27 @@ class ModelCache:
                 loaded = False
                 errors = []
                 
-                # Méthode 1: MLflow (pour dossiers avec MLmodel)
-                if os.path.isdir(model_path) or (os.path.isdir(os.path.dirname(model_path)) and 
-                    os.path.exists(os.path.join(os.path.dirname(model_path), "MLmodel"))):
-                    try:
-                        load_path = model_path if os.path.isdir(model_path) else os.path.dirname(model_path)
-                        logger.info(f"🔄 Tentative MLflow depuis: {load_path}")
-                        self.model = mlflow.sklearn.load_model(load_path)
-                        self.load_method = "mlflow"
-                        loaded = True
-                        logger.info("✅ Modèle chargé via mlflow.sklearn.load_model")
-                    except Exception as e1:
-                        errors.append(f"MLflow: {str(e1)}")
-                        logger.warning(f"⚠️ Échec MLflow: {e1}")
+                is_file = os.path.isfile(model_path)
                 
-                # Méthode 2: joblib avec gestion d'erreur spéciale
-                if not loaded and os.path.isfile(model_path):
+                # Méthode 1: joblib memory-mappé, seulement pour les gros modèles
+                # (mmap uniquement effectif si le modèle a été sauvé via
+                # joblib.dump(..., compress=0): les arrays NumPy sont alors
+                # partagés entre workers via le page cache de l'OS).
+                # En dessous du seuil, pickle (unpickler C) est bien plus rapide
+                # que l'unpickler Python de joblib: on passe directement à la méthode 2
+                if is_file and os.path.getsize(model_path) > MMAP_MIN_SIZE:
                     try:
-                        logger.info(f"🔄 Tentative joblib depuis: {model_path}")
-                        # Utiliser mmap_mode=None pour éviter les problèmes de compatibilité
-                        import sklearn
-                        logger.info(f"Version sklearn: {sklearn.__version__}")
-                        self.model = joblib.load(model_path)
+                        logger.info(f"🔄 Tentative joblib depuis: {model_path} (mmap_mode=r)")
+                        self.model = joblib.load(model_path, mmap_mode='r')
                         self.load_method = "joblib"
                         loaded = True
                         logger.info("✅ Modèle chargé via joblib")
-                    except Exception as e2:
-                        errors.append(f"Joblib: {str(e2)}")
-                        logger.warning(f"⚠️ Échec joblib: {e2}")
+                    except Exception as e1:
+                        errors.append(f"Joblib: {str(e1)}")
+                        logger.warning(f"⚠️ Échec joblib: {e1}")
                 
-                # Méthode 3: pickle standard
-                if not loaded and os.path.isfile(model_path):
+                # Méthode 2: pickle standard
+                if not loaded and is_file:
                     try:
                         logger.info(f"🔄 Tentative pickle depuis: {model_path}")
                         with open(model_path, 'rb') as f:
@@ -318,24 +446,44 @@ class ModelCache:
                         self.load_method = "pickle"
                         loaded = True
                         logger.info("✅ Modèle chargé via pickle")
+                    except Exception as e2:
+                        errors.append(f"Pickle: {str(e2)}")
+                        logger.warning(f"⚠️ Échec pickle: {e2}")
+                
+                # Méthode 3: MLflow (dossier avec MLmodel, ou fallback sur le dossier parent)
+                if not loaded and (not is_file or os.path.exists(
+                        os.path.join(os.path.dirname(model_path), "MLmodel"))):
+                    try:
+                        load_path = model_path if not is_file else os.path.dirname(model_path)
+                        logger.info(f"🔄 Tentative MLflow depuis: {load_path}")
+                        # Import paresseux: MLflow (SQLAlchemy, protobuf...) alourdit chaque worker
+                        import mlflow.sklearn
+                        self.model = mlflow.sklearn.load_model(load_path)
+                        self.load_method = "mlflow"
+                        loaded = True
+                        logger.info("✅ Modèle chargé via mlflow.sklearn.load_model")
                     except Exception as e3:
-                        errors.append(f"Pickle: {str(e3)}")
-                        logger.warning(f"⚠️ Échec pickle: {e3}")
+                        errors.append(f"MLflow: {str(e3)}")
+                        logger.warning(f"⚠️ Échec MLflow: {e3}")
                 
                 if not loaded:
                     raise Exception(f"Toutes les méthodes ont échoué: {' | '.join(errors)}")
                 
                 self.model_path = model_path
+                self._configure_n_jobs()
+                self.predict = self.model.predict
+                self.predict_proba = self.model.predict_proba
                 logger.info(f"✅ Modèle chargé avec succès")
                 logger.info(f"   Type: {type(self.model)}")
                 logger.info(f"   Méthode: {self.load_method}")
                 
-                # Tester le modèle avec des données factices
-                try:
-                    self._test_model()
-                except Exception as test_error:
-                    logger.error(f"❌ Le modèle ne fonctionne pas correctement: {test_error}")
-                    raise
+                # Tester le modèle avec des données factices (optionnel)
+                if TEST_MODEL_ON_LOAD:
+                    try:
+                        self._test_model()
+                    except Exception as test_error:
+                        logger.error(f"❌ Le modèle ne fonctionne pas correctement: {test_error}")
+                        raise
             
             return self.model
             
@@ -346,39 +494,24 @@ class ModelCache:
                 detail=f"Impossible de charger le modèle: {str(e)}"
             )
     
+    def _configure_n_jobs(self):
+        """Aligne n_jobs de l'estimateur final sur les threads alloués au worker"""
+        estimator = self.model.steps[-1][1] if hasattr(self.model, "steps") else self.model
+        if hasattr(estimator, "n_jobs"):
+            estimator.n_jobs = THREADS_PER_WORKER
+            logger.info(f"   n_jobs: {THREADS_PER_WORKER} (workers: {WORKERS})")
+    
     def _test_model(self):
         """Teste le modèle avec des données factices"""
         try:
             logger.info("🧪 Test du modèle avec des données factices...")
-            test_data = {
-                "Duration in month": 12,
-                "Credit amount": 5000.0,
-                "Installment rate in percentage of disposable income": 2,
-                "Age in years": 35,
-                "Number of existing credits at this bank": 1,
-                "Number of people being liable to provide maintenance for": 1,
-                "Status of existing checking account": "A12",
-                "Credit history": "A32",
-                "Savings account/bonds": "A61",
-                "Present employment since": "A73",
-                "Job": "A173",
-                "Purpose": "A43",
-                "Personal status and sex": "A93",
-                "Other debtors / guarantors": "A101",
-                "Property": "A121",
-                "Other installment plans": "A143",
-                "Housing": "A152",
-                "Telephone": "A192",
-                "foreign worker": "A201"
-            }
-            df_test = pd.DataFrame([test_data])
             
             # Test predict
-            pred = self.model.predict(df_test)
+            pred = self.model.predict(TEST_DATAFRAME)
             logger.info(f"   Test predict: {pred}")
             
             # Test predict_proba
-            proba = self.model.predict_proba(df_test)
+            proba = self.model.predict_proba(TEST_DATAFRAME)
             logger.info(f"   Test predict_proba: {proba}")
             
             logger.info("✅ Test du modèle réussi!")
@@ -399,6 +532,16 @@ model_cache = ModelCache()
 
 
 # ==================== FONCTIONS UTILITAIRES ====================
+# Seuils de risque: p < 0.4 -> HIGH, 0.4 <= p < 0.7 -> MEDIUM, p >= 0.7 -> LOW
+_RISK_BINS = np.array([0.4, 0.7])
+_RISK_LABELS = np.array(["HIGH", "MEDIUM", "LOW"])
+
+
+def risk_levels(probabilities: np.ndarray) -> np.ndarray:
+    """Version vectorisée de calculate_risk_level pour un batch de probabilités"""
+    return _RISK_LABELS[np.digitize(probabilities, _RISK_BINS)]
+
+
 def calculate_risk_level(probability: float) -> str:
     """Détermine le niveau de risque basé sur la probabilité"""
     if probability >= 0.7:
@@ -409,66 +552,65 @@ def calculate_risk_level(probability: float) -> str:
         return "HIGH"
 
 
-def make_prediction(model, df: pd.DataFrame) -> Dict[str, Any]:
-    """Fait une prédiction et retourne les résultats formatés"""
+@lru_cache(maxsize=PREDICTION_CACHE_SIZE)
+def _predict_cached(key: tuple) -> Tuple[int, float, float, str]:
+    """
+    Inférence pour une demande, mise en cache par contenu (clé: to_key()).
+    Le cache est vidé par /api/reload-model. La latence n'est mesurée qu'ici
+    (cache miss): credit_prediction_duration_seconds reflète l'inférence réelle.
+    """
+    df = build_dataframe([key])
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("🔮 Début de la prédiction...")
+        logger.debug("   Type modèle: %s", type(model_cache.model))
+        logger.debug("   Shape DataFrame: %s", df.shape)
+        logger.debug("   Colonnes: %s", df.columns.tolist())
+    
+    # Prédiction
     start_time = time.time()
     try:
-        logger.info(f"🔮 Début de la prédiction...")
-        logger.info(f"   Type modèle: {type(model)}")
-        logger.info(f"   Shape DataFrame: {df.shape}")
-        logger.info(f"   Colonnes: {df.columns.tolist()}")
-        
-        # Prédiction
-        logger.info("   Appel model.predict()...")
-        prediction = model.predict(df)[0]
-        logger.info(f"   ✅ Prédiction: {prediction}")
-        
-        logger.info("   Appel model.predict_proba()...")
-        probabilities = model.predict_proba(df)[0]
-        logger.info(f"   ✅ Probabilités: {probabilities}")
-        
-        # Proba classe 1 (bon crédit)
-        prob_good = float(probabilities[1])
-        prob_bad = float(probabilities[0])
-        
-        result = {
-            "prediction": int(prediction),
-            "probability_good_credit": prob_good,
-            "probability_bad_credit": prob_bad,
-            "risk_level": calculate_risk_level(prob_good)
-        }
+        prediction = model_cache.predict(df)[0]
+        probabilities = model_cache.predict_proba(df)[0]
+    finally:
+        prediction_latency.observe(time.time() - start_time)
+    if debug:
+        logger.debug("   ✅ Prédiction: %s", prediction)
+        logger.debug("   ✅ Probabilités: %s", probabilities)
+    
+    # Proba classe 1 (bon crédit)
+    prob_good = float(probabilities[1])
+    return (int(prediction), prob_good, float(probabilities[0]), calculate_risk_level(prob_good))
+
+
+def make_prediction(key: tuple) -> Tuple[int, float, float, str]:
+    """
+    Fait une prédiction avec le modèle en cache pour une demande (clé: to_key()).
+    Retourne (prediction, proba_bon_credit, proba_mauvais_credit, niveau_de_risque).
+    """
+    try:
+        result = _predict_cached(key)
+        prediction = result[0]
         
         # Incrémenter les métriques Prometheus
-        prediction_counter.labels(
-            prediction_type='single',
-            status='success'
-        ).inc()
+        PRED_SINGLE_OK.inc()
         
-        if int(prediction) == 1:
+        if prediction == 1:
             prediction_good_credit.inc()
         else:
             prediction_bad_credit.inc()
         
-        # Enregistrer la latence
-        duration = time.time() - start_time
-        prediction_latency.observe(duration)
-        
-        logger.info(f"✅ Résultat final: {result}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("✅ Résultat final: %s (cache: %s)", result, _predict_cached.cache_info())
         return result
         
     except Exception as e:
-        prediction_counter.labels(
-            prediction_type='single',
-            status='error'
-        ).inc()
+        PRED_SINGLE_ERR.inc()
         api_request_errors.labels(
             endpoint='predict',
             error_type=type(e).__name__
         ).inc()
         
-        duration = time.time() - start_time
-        prediction_latency.observe(duration)
-        
         logger.error(f"❌ Erreur lors de la prédiction: {e}", exc_info=True)
         raise HTTPException(
             status_code=500,
@@ -477,6 +619,8 @@ def make_prediction(model, df: pd.DataFrame) -> Dict[str, Any]:
 
 
 # ==================== ENDPOINTS ====================
+# Les endpoints qui appellent le modèle (sklearn, bloquant) sont en `def`:
+# FastAPI les exécute dans le threadpool au lieu de bloquer l'event loop.
 
 @app.get("/", tags=["Home"])
 async def root():
@@ -498,7 +642,7 @@ async def root():
 
 
 @app.get("/api/health", response_model=HealthResponse, tags=["Health"])
-async def health_check():
+def health_check():
     """Vérifie l'état de santé de l'API"""
     try:
         model, version = model_cache.get_model()
@@ -515,7 +659,7 @@ async def health_check():
 
 
 @app.get("/api/model-info", tags=["Models"])
-async def get_model_info():
+def get_model_info():
     """Récupère les informations du modèle chargé"""
     try:
         model, version = model_cache.get_model()
@@ -534,7 +678,7 @@ async def get_model_info():
 
 
 @app.post("/api/predict", response_model=PredictionResponse, tags=["Predictions"])
-async def predict_credit(application: CreditApplicationInput):
+def predict_credit(application: CreditApplicationInput):
     """
     Prédit le risque de crédit pour une demande individuelle.
     
@@ -547,23 +691,24 @@ async def predict_credit(application: CreditApplicationInput):
         # Charger le modèle
         model, version = model_cache.get_model()
         
-        # Convertir en DataFrame
-        df = application.to_dataframe()
+        logger.info("📥 Nouvelle requête de prédiction")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("   Données: %s", application.to_row_dict())
         
-        logger.info(f"📥 Nouvelle requête de prédiction")
-        logger.info(f"   Données: {df.iloc[0].to_dict()}")
+        # Faire la prédiction (mise en cache pour les demandes identiques)
+        prediction, prob_good, prob_bad, risk = make_prediction(application.to_key())
         
-        # Faire la prédiction
-        result = make_prediction(model, df)
-        
-        # Créer la réponse
-        response = PredictionResponse(
-            **result,
+        # Créer la réponse (valeurs produites par notre code: pas de revalidation)
+        response = PredictionResponse.model_construct(
+            prediction=prediction,
+            probability_good_credit=prob_good,
+            probability_bad_credit=prob_bad,
+            risk_level=risk,
             model_version=str(version),
             timestamp=datetime.now().isoformat()
         )
         
-        logger.info(f"📤 Résultat: {result['prediction']} (proba: {result['probability_good_credit']:.3f})")
+        logger.info("📤 Résultat: %s (proba: %.3f)", prediction, prob_good)
         
         return response
         
@@ -578,7 +723,7 @@ async def predict_credit(application: CreditApplicationInput):
 
 
 @app.post("/api/predict-batch", response_model=BatchPredictionResponse, tags=["Predictions"])
-async def predict_batch(request: BatchPredictionRequest):
+def predict_batch(request: BatchPredictionRequest):
     """
     Prédit le risque de crédit pour plusieurs demandes en batch.
     
@@ -589,40 +734,69 @@ async def predict_batch(request: BatchPredictionRequest):
         # Charger le modèle
         model, version = model_cache.get_model()
         
-        # Convertir toutes les applications en DataFrame
-        dfs = [app.to_dataframe() for app in request.applications]
-        df_batch = pd.concat(dfs, ignore_index=True)
-        
-        logger.info(f"📥 Prédiction batch pour {len(request.applications)} demandes")
-        
-        # Faire les prédictions
-        predictions_list = []
-        for i, row in df_batch.iterrows():
-            df_single = pd.DataFrame([row])
-            result = make_prediction(model, df_single)
-            
-            predictions_list.append(
-                PredictionResponse(
-                    **result,
-                    model_version=version,
-                    timestamp=datetime.now().isoformat()
-                )
+        # Batch vide: réponse vide (le modèle refuse un appel sur 0 ligne)
+        if not request.applications:
+            return BatchPredictionResponse(
+                predictions=[],
+                total_processed=0,
+                model_version=str(version),
+                timestamp=datetime.now().isoformat()
             )
         
+        # Convertir toutes les applications en un seul DataFrame
+        df_batch = build_dataframe([app.to_key() for app in request.applications])
+        
+        logger.info("📥 Prédiction batch pour %d demandes", len(request.applications))
+
+        # Faire les prédictions en un seul appel sur tout le batch
+        start_time = time.time()
+        predictions = model_cache.predict(df_batch)
+        probabilities = model_cache.predict_proba(df_batch)
+        prob_good = probabilities[:, 1]
+        prob_bad = probabilities[:, 0]
+        risks = risk_levels(prob_good)
+
+        # Incrémenter les métriques Prometheus une seule fois pour le batch
+        n_good = int(predictions.sum())
+        PRED_BATCH_OK.inc(len(predictions))
+        prediction_good_credit.inc(n_good)
+        prediction_bad_credit.inc(len(predictions) - n_good)
+        prediction_latency.observe(time.time() - start_time)
+
+        # Horodatage et version calculés une seule fois pour tout le batch
+        timestamp = datetime.now().isoformat()
+        model_version = str(version)
+        predictions_list = [
+            PredictionResponse.model_construct(
+                prediction=int(pred),
+                probability_good_credit=float(p_good),
+                probability_bad_credit=float(p_bad),
+                risk_level=str(risk),
+                model_version=model_version,
+                timestamp=timestamp
+            )
+            for pred, p_good, p_bad, risk in zip(predictions, prob_good, prob_bad, risks)
+        ]
+
         response = BatchPredictionResponse(
             predictions=predictions_list,
             total_processed=len(predictions_list),
-            model_version=str(version),
-            timestamp=datetime.now().isoformat()
+            model_version=model_version,
+            timestamp=timestamp
         )
         
-        logger.info(f"✅ Batch terminé: {len(predictions_list)} prédictions")
+        logger.info("✅ Batch terminé: %d prédictions", len(predictions_list))
         
         return response
         
     except HTTPException:
         raise
     except Exception as e:
+        PRED_BATCH_ERR.inc()
+        api_request_errors.labels(
+            endpoint='predict-batch',
+            error_type=type(e).__name__
+        ).inc()
         logger.error(f"❌ Erreur batch: {e}", exc_info=True)
         raise HTTPException(
             status_code=500,
@@ -631,11 +805,19 @@ async def predict_batch(request: BatchPredictionRequest):
 
 
 @app.post("/api/reload-model", tags=["Admin"])
-async def reload_model():
-    """Force le rechargement du modèle depuis le disque"""
+def reload_model():
+    """
+    Force le rechargement du modèle depuis le disque.
+    
+    Avec plusieurs workers gunicorn, seul le worker qui reçoit la requête
+    recharge son modèle et vide son cache de prédictions: pour recharger
+    tous les workers, redémarrer le service (ex: docker compose restart api).
+    """
     try:
         model_cache.model = None
         model_cache.model_path = None
+        model_cache._resolved_path = None
+        _predict_cached.cache_clear()
         
         model, version = model_cache.get_model()
         
@@ -675,6 +857,7 @@ async def startup_event():
     logger.info("="*60)
     logger.info("🚀 DÉMARRAGE DE L'API CREDIT SCORE ML (DOCKER)")
     logger.info("="*60)
+    logger.info(f"Version sklearn: {_SKLEARN_VERSION}")
     
     # Lister tous les chemins possibles
     logger.info("📂 Chemins de recherche du modèle:")
@@ -716,6 +899,15 @@ async def startup_event():
     logger.info("="*60)
 
 
+# ==================== PRÉCHARGEMENT ====================
+# Charger le modèle à l'import: avec `gunicorn --preload`, il est chargé une
+# seule fois dans le master puis partagé par les workers forkés (copy-on-write)
+try:
+    model_cache.get_model()
+except Exception as e:
+    logger.warning(f"⚠️ Modèle non préchargé à l'import: {e}")
+
+
 # ==================== LANCEMENT ====================
 if __name__ == "__main__":
     import uvicorn
@@ -728,6 +920,8 @@ if __name__ == "__main__":
     print(f"📂 Model Paths: {MODEL_PATHS}")
     print("="*60 + "\n")
     
+    # Un seul worker en local: pour plusieurs workers, utiliser gunicorn
+    # avec gunicorn.conf.py (métriques Prometheus agrégées entre workers)
     uvicorn.run(
         app,
         host="0.0.0.0",
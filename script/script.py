@@ -3,8 +3,9 @@ import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, FunctionTransformer
+from sklearn.preprocessing import FunctionTransformer
 from sklearn.pipeline import Pipeline
+from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.compose import ColumnTransformer
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import mlflow
@@ -12,7 +13,10 @@ import mlflow.sklearn
 from mlflow.models.signature import infer_signature
 from mlflow.tracking import MlflowClient
 import joblib
+from joblib import Memory
 import json
+import hashlib
+import inspect
 
 
 # ==================== CONFIGURATION DES FEATURES ====================
@@ -94,16 +98,30 @@ ALL_MAPPINGS = {
 
 
 # ==================== FONCTIONS DE PREPROCESSING ====================
+def mapping_lookup(mapping):
+    """
+    Table de lookup d'un mapping: index des clés (table de hachage construite une
+    seule fois) et valeurs mappées suivies de -1. get_indexer donne la position de
+    chaque clé (-1 si inconnue, qui sélectionne le -1 final): values[codes].
+    """
+    return pd.Index(list(mapping.keys())), np.array(list(mapping.values()) + [-1])
+
+
+# Tables de lookup précompilées
+ALL_MAPPING_LOOKUPS = {col: mapping_lookup(mapping) for col, mapping in ALL_MAPPINGS.items()}
+
+
 def apply_ordinal_mappings(df):
     """Applique les mappings ordinaux aux colonnes catégorielles"""
     df = df.copy()
     for col, mapping in ALL_MAPPINGS.items():
         if col in df.columns:
-            df[col] = df[col].map(mapping)
-            # Gérer les valeurs manquantes ou inconnues
-            if df[col].isna().any():
+            # Valeurs mappées, -1 pour les valeurs manquantes ou inconnues
+            index, values = ALL_MAPPING_LOOKUPS[col]
+            codes = index.get_indexer(df[col])
+            if (codes == -1).any():
                 print(f"⚠️ Attention: valeurs inconnues dans '{col}', remplacement par -1")
-                df[col] = df[col].fillna(-1)
+            df[col] = values[codes]
     return df
 
 
@@ -126,72 +144,150 @@ def create_preprocessing_pipeline():
     return ordinal_transformer
 
 
-class CustomPreprocessor:
-    """Préprocesseur personnalisé pour gérer tout le pipeline"""
+class CustomPreprocessor(BaseEstimator, TransformerMixin):
+    """
+    Préprocesseur personnalisé pour gérer tout le pipeline.
+    Hérite de BaseEstimator pour être clonable et hachable par ses paramètres
+    (clé du cache disque joblib de fit_preprocessor).
+    
+    Si n_bins est fourni, les colonnes numériques sont discrétisées en n_bins
+    intervalles de quantiles (identifiants 0..n_bins-1) au lieu d'être standardisées.
+    """
     
-    def __init__(self, numerical_features, ordinal_features, nominal_features, mappings):
+    def __init__(self, numerical_features, ordinal_features, nominal_features, mappings,
+                 n_bins=None):
         self.numerical_features = numerical_features
         self.ordinal_features = ordinal_features
         self.nominal_features = nominal_features
         self.mappings = mappings
-        self.scaler = StandardScaler()
-        self.feature_names_ = None
+        self.n_bins = n_bins
         
     def fit(self, X, y=None):
-        """Fit le scaler sur les données d'entraînement"""
-        X_processed = self._apply_mappings_and_encoding(X)
-        # Fit le scaler seulement sur les colonnes numériques
-        num_cols = [col for col in X_processed.columns if col in self.numerical_features]
-        if num_cols:
-            self.scaler.fit(X_processed[num_cols])
-        self.feature_names_ = list(X_processed.columns)
+        """Apprend les catégories nominales et la standardisation des colonnes numériques"""
+        # Tables de lookup des mappings ordinaux
+        self.cat_lookups_ = {col: mapping_lookup(mapping) for col, mapping in self.mappings.items()}
+        
+        # Catégories nominales apprises (triées, la première est retirée: drop_first)
+        self.nominal_categories_ = {
+            col: sorted(X[col].dropna().unique())[1:]
+            for col in self.nominal_features if col in X.columns
+        }
+        self.nominal_indexes_ = {col: pd.Index(cats) for col, cats in self.nominal_categories_.items()}
+        X_processed, self.feature_names_ = self._apply_mappings_and_encoding(X, fitting=True)
+        self.feature_index_ = {col: i for i, col in enumerate(self.feature_names_)}
+        
+        # Moyenne / écart-type des colonnes numériques (équivalent StandardScaler),
+        # stockés en float32 pour être appliqués en place au transform
+        self.num_idx_ = [i for i, col in enumerate(self.feature_names_) if col in self.numerical_features]
+        arr = X_processed[:, self.num_idx_].astype(np.float64)
+        self.mean_ = arr.mean(axis=0).astype(np.float32)
+        self.scale_ = arr.std(axis=0).astype(np.float32)
+        self.scale_[self.scale_ == 0] = 1.0
+        
+        # Bornes des intervalles de quantiles (histogramme à la HistGradientBoosting):
+        # moins de seuils candidats à évaluer par le RandomForest
+        self.bin_edges_ = None
+        if self.n_bins:
+            quantiles = np.linspace(0, 1, self.n_bins + 1)[1:-1]
+            self.bin_edges_ = [
+                np.unique(np.quantile(arr[:, k], quantiles)).astype(np.float32)
+                for k in range(arr.shape[1])
+            ]
         return self
     
     def transform(self, X):
-        """Transform les données"""
-        X_processed = self._apply_mappings_and_encoding(X)
+        """Transform les données en matrice NumPy float32 (colonnes: feature_names_)"""
+        # Matrice float32 C-contiguë: le RandomForest l'utilise sans recopie
+        # (il travaille en float32 en interne, les seuils de split n'ont pas
+        # besoin de plus de précision)
+        # (colonnes déjà dans l'ordre de feature_names_, manquantes à 0)
+        out, _ = self._apply_mappings_and_encoding(X)
         
-        # Scale les features numériques
-        num_cols = [col for col in X_processed.columns if col in self.numerical_features]
-        if num_cols:
-            X_processed[num_cols] = self.scaler.transform(X_processed[num_cols])
+        # Discrétiser les features numériques (identifiant de l'intervalle)
+        if self.bin_edges_ is not None:
+            for j, edges in zip(self.num_idx_, self.bin_edges_):
+                out[:, j] = np.searchsorted(edges, out[:, j], side='right')
         
-        # S'assurer que les colonnes sont dans le bon ordre
-        if self.feature_names_:
-            # Ajouter les colonnes manquantes avec des 0
-            for col in self.feature_names_:
-                if col not in X_processed.columns:
-                    X_processed[col] = 0
-            X_processed = X_processed[self.feature_names_]
+        # Sinon les standardiser en place, colonne par colonne (une sélection
+        # out[:, num_idx_] serait une copie)
+        else:
+            for j, mean, scale in zip(self.num_idx_, self.mean_, self.scale_):
+                out[:, j] -= mean
+                out[:, j] /= scale
         
-        return X_processed
+        return out
+    
+    def __sklearn_is_fitted__(self):
+        """Indique à sklearn si le préprocesseur a été fitté"""
+        return hasattr(self, 'feature_names_')
     
     def fit_transform(self, X, y=None):
         """Fit et transform"""
         return self.fit(X, y).transform(X)
     
-    def _apply_mappings_and_encoding(self, X):
-        """Applique les mappings et le one-hot encoding"""
-        X = X.copy()
+    def _apply_mappings_and_encoding(self, X, fitting=False):
+        """
+        Applique les mappings et le one-hot encoding.
+        Écrit directement dans une matrice float32 préallouée, sans copier le
+        DataFrame: retourne la matrice et la liste des noms de colonnes.
+        Hors fit (fitting=False), chaque colonne est écrite à sa position dans
+        feature_names_ (via feature_index_): colonnes manquantes laissées à 0,
+        inconnues ignorées.
+        """
+        cols_to_encode = [col for col in self.nominal_features if col in X.columns]
+        kept_cols = [col for col in X.columns if col not in cols_to_encode]
+        indexes = [self.nominal_indexes_.get(col, pd.Index([])) for col in cols_to_encode]
         
-        # 1. Appliquer les mappings ordinaux
-        for col, mapping in self.mappings.items():
-            if col in X.columns:
-                X[col] = X[col].map(mapping)
-                if X[col].isna().any():
-                    X[col] = X[col].fillna(-1)
+        if fitting:
+            # Au fit: colonnes conservées dans l'ordre d'entrée, puis les dummies
+            names = kept_cols + [f"{col}_{cat}" for col, index in zip(cols_to_encode, indexes) for cat in index]
+            feature_index = {col: i for i, col in enumerate(names)}
+        else:
+            names = self.feature_names_
+            feature_index = self.feature_index_
+        out = np.zeros((len(X), len(names)), dtype=np.float32)
         
-        # 2. One-hot encoding des variables nominales
-        cols_to_encode = [col for col in self.nominal_features if col in X.columns]
+        # 1. Colonnes conservées: mappings ordinaux (valeurs mappées, -1 si inconnu),
+        #    les autres converties en float32
+        for col in kept_cols:
+            j = feature_index.get(col)
+            if j is None:
+                continue
+            if col in self.cat_lookups_:
+                index, values = self.cat_lookups_[col]
+                out[:, j] = values[index.get_indexer(X[col])]
+            else:
+                out[:, j] = X[col].to_numpy(dtype=np.float32)
+        
+        # 2. One-hot encoding de toutes les variables nominales en une seule passe:
+        #    codes empilés (catégories apprises au fit) puis un seul scatter
+        #    (code -1: inconnue ou première catégorie -> que des 0; les dummies
+        #    d'une colonne sont contiguës, à partir de la position de la première)
         if cols_to_encode:
-            X = pd.get_dummies(X, columns=cols_to_encode, drop_first=True)
+            codes = np.column_stack([index.get_indexer(X[col]) for col, index in zip(cols_to_encode, indexes)])
+            offsets = np.array([
+                feature_index[f"{col}_{index[0]}"] if len(index) else 0
+                for col, index in zip(cols_to_encode, indexes)
+            ])
+            rows, k = np.nonzero(codes >= 0)
+            out[rows, offsets[k] + codes[rows, k]] = 1
         
-        return X
+        return out, names
 
 
 # ==================== CHARGEMENT ET PRÉPARATION DES DONNÉES ====================
 print("📊 Chargement des données...")
-data = pd.read_csv('data/estadistical.csv')
+csv_path = 'data/estadistical.csv'
+
+# Colonnes catégorielles lues directement en 'category' (codes entiers au lieu
+# de chaînes Python). Les noms bruts du CSV peuvent contenir des espaces.
+categorical_dtypes = {col: 'category' for col in ordinal_categorical_features + nominal_categorical_features}
+raw_columns = pd.read_csv(csv_path, nrows=0).columns
+data = pd.read_csv(
+    csv_path,
+    dtype={col: categorical_dtypes[col.strip()] for col in raw_columns if col.strip() in categorical_dtypes},
+    engine='c'
+)
 data.columns = data.columns.str.strip()
 data = data.rename(columns={'Receive/ Not receive credit': 'Credit_Risk'})
 
@@ -221,17 +317,42 @@ preprocessor = CustomPreprocessor(
     numerical_features=numerical_features,
     ordinal_features=ordinal_categorical_features,
     nominal_features=nominal_categorical_features,
-    mappings=ALL_MAPPINGS
+    mappings=ALL_MAPPINGS,
+    n_bins=256
 )
 
+# Cache disque du fit_transform du preprocessor (réutilisé entre exécutions).
+# joblib identifie la classe par son nom (__main__.CustomPreprocessor) et non par
+# son code: le répertoire dépend donc du source de la classe et des mappings,
+# pour ne jamais resservir un résultat calculé par une ancienne version.
+preprocessor_hash = hashlib.sha256(
+    (inspect.getsource(CustomPreprocessor) + json.dumps(ALL_MAPPINGS, sort_keys=True)).encode()
+).hexdigest()[:16]
+memory = Memory(location=os.path.join('.pipeline_cache', preprocessor_hash), verbose=0)
+
+
+@memory.cache
+def fit_preprocessor(preprocessor, X):
+    """Fit le preprocessor et transforme X (résultat mis en cache disque)"""
+    X_processed = preprocessor.fit_transform(X)
+    return preprocessor, X_processed
+
+
+# Forêt construite par paliers (warm_start): 4 x 25 arbres
+n_estimators_total = 100
+n_estimators_step = 25
+
 # Pipeline complet
 pipeline = Pipeline([
     ('preprocessor', preprocessor),
     ('classifier', RandomForestClassifier(
-        n_estimators=100,
+        n_estimators=n_estimators_step,
+        warm_start=True,
         max_depth=10,
         min_samples_split=20,
         min_samples_leaf=10,
+        max_features='sqrt',
+        bootstrap=True,
         random_state=42,
         n_jobs=-1
     ))
@@ -242,7 +363,22 @@ print("✅ Pipeline créé")
 
 # ==================== ENTRAÎNEMENT ====================
 print("\n🚀 Entraînement du modèle...")
-pipeline.fit(X_train, y_train)
+# Preprocessing fait une seule fois, hors de la boucle (fit_transform mis en
+# cache disque): le preprocessor fitté retourné remplace celui du Pipeline
+preprocessor, X_train_pre = fit_preprocessor(pipeline.named_steps['preprocessor'], X_train)
+pipeline.set_params(preprocessor=preprocessor)
+X_test_pre = preprocessor.transform(X_test)
+
+# Paliers: seuls les nouveaux arbres sont construits à chaque fit
+# (accuracy intermédiaire conservée pour MLflow)
+classifier = pipeline.named_steps['classifier']
+staged_accuracy = []
+for n_estimators in range(n_estimators_step, n_estimators_total + 1, n_estimators_step):
+    classifier.set_params(n_estimators=n_estimators)
+    classifier.fit(X_train_pre, y_train)
+    staged_accuracy.append(accuracy_score(y_test, classifier.predict(X_test_pre)))
+    print(f"   {classifier.n_estimators} arbres - accuracy test: {staged_accuracy[-1]:.4f}")
+
 print("✅ Entraînement terminé")
 
 
@@ -276,14 +412,20 @@ with mlflow.start_run(run_name="rf-pipeline-v2") as run:
     mlflow.log_metric("accuracy", accuracy)
     mlflow.log_metric("test_samples", len(X_test))
     mlflow.log_metric("train_samples", len(X_train))
+    for step, acc in enumerate(staged_accuracy):
+        mlflow.log_metric("staged_test_accuracy", acc, step=step)
     
     # 2. Logger les hyperparamètres du modèle
     mlflow.log_params({
-        "n_estimators": 100,
+        "n_estimators": n_estimators_total,
+        "n_estimators_step": n_estimators_step,
         "max_depth": 10,
         "min_samples_split": 20,
         "min_samples_leaf": 10,
-        "random_state": 42
+        "max_features": "sqrt",
+        "bootstrap": True,
+        "random_state": 42,
+        "n_bins": preprocessor.n_bins
     })
     
     # 3. Logger le rapport de classification
@@ -305,9 +447,13 @@ with mlflow.start_run(run_name="rf-pipeline-v2") as run:
     
     # 5. Créer la signature avec les colonnes ORIGINALES (avant preprocessing)
     # Ceci est crucial pour que l'API sache quelles colonnes accepter
-    signature = infer_signature(X_train, pipeline.predict(X_train))
+    # (un échantillon suffit pour inférer les types, inutile de prédire tout le train)
+    signature_sample = X_train.iloc[:100]
+    signature = infer_signature(signature_sample, pipeline.predict(signature_sample))
     
-    # 6. Logger le pipeline complet
+    # 6. Logger le pipeline complet (sans warm_start: un fit ultérieur du modèle
+    # chargé doit reconstruire la forêt au lieu de ne rien ajouter)
+    pipeline.set_params(classifier__warm_start=False)
     mlflow.sklearn.log_model(
         sk_model=pipeline,
         artifact_path="model",
@@ -329,11 +475,10 @@ print("\n🎯 Promotion du modèle en Production...")
 try:
     client = MlflowClient()
     
-    # Récupérer la dernière version
-    versions = client.search_model_versions("name='RDF_score_pipeline'")
+    # Récupérer la dernière version non promue (résolue par le backend du registry)
+    versions = client.get_latest_versions("RDF_score_pipeline", stages=["None"])
     if versions:
-        latest_version = max(versions, key=lambda v: int(v.version))
-        version_number = latest_version.version
+        version_number = versions[0].version
         
         # Transition vers Production
         client.transition_model_version_stage(
@@ -4,8 +4,9 @@ Script de test pour générer des métriques Prometheus
 Effectue des appels API pour vérifier le monitoring
 """
 
+import asyncio
 import requests
-import time
+from requests.adapters import HTTPAdapter
 import json
 import random
 from typing import Dict, Any
@@ -14,6 +15,10 @@ from typing import Dict, Any
 API_BASE_URL = "http://localhost:8000"
 METRICS_URL = f"{API_BASE_URL}/metrics"
 
+# Session HTTP partagée (connexions keep-alive réutilisées entre les appels)
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=10))
+
 # Exemple de données de crédit
 SAMPLE_CREDIT_APPLICATIONS = [
     {
@@ -85,7 +90,7 @@ SAMPLE_CREDIT_APPLICATIONS = [
 def check_api_health() -> bool:
     """Vérifie la santé de l'API"""
     try:
-        response = requests.get(f"{API_BASE_URL}/api/health", timeout=5)
+        response = session.get(f"{API_BASE_URL}/api/health", timeout=5)
         if response.status_code == 200:
             print("✅ API Health: OK")
             print(f"   {response.json()}")
@@ -101,7 +106,7 @@ def check_api_health() -> bool:
 def test_single_prediction(application: Dict[str, Any]) -> bool:
     """Teste une prédiction simple"""
     try:
-        response = requests.post(
+        response = session.post(
             f"{API_BASE_URL}/api/predict",
             json=application,
             timeout=10
@@ -136,7 +141,7 @@ def test_batch_predictions() -> bool:
             "applications": SAMPLE_CREDIT_APPLICATIONS
         }
         
-        response = requests.post(
+        response = session.post(
             f"{API_BASE_URL}/api/predict-batch",
             json=payload,
             timeout=15
@@ -159,7 +164,7 @@ def test_batch_predictions() -> bool:
 def get_metrics() -> bool:
     """Récupère les métriques Prometheus"""
     try:
-        response = requests.get(METRICS_URL, timeout=5)
+        response = session.get(METRICS_URL, timeout=5)
         
         if response.status_code == 200:
             lines = response.text.split('\n')
@@ -196,26 +201,82 @@ def get_metrics() -> bool:
         return False
 
 
-def run_load_test(num_requests: int = 10, delay: float = 0.5):
-    """Teste avec plusieurs requêtes"""
-    print(f"\n🔄 Exécution de {num_requests} requêtes de test...")
+def run_load_test(num_requests: int = 10):
+    """Teste avec plusieurs demandes envoyées en un seul appel batch"""
+    print(f"\n🔄 Exécution de {num_requests} prédictions de test (un seul appel batch)...")
     print("-" * 60)
     
+    payload = {
+        "applications": [random.choice(SAMPLE_CREDIT_APPLICATIONS) for _ in range(num_requests)]
+    }
+    
     successful = 0
-    failed = 0
     
-    for i in range(num_requests):
-        print(f"\n[{i+1}/{num_requests}] Test #{ + i}")
-        
-        app = random.choice(SAMPLE_CREDIT_APPLICATIONS)
+    try:
+        response = session.post(
+            f"{API_BASE_URL}/api/predict-batch",
+            json=payload,
+            timeout=30
+        )
         
-        if test_single_prediction(app):
-            successful += 1
+        if response.status_code == 200:
+            for i, result in enumerate(response.json().get('predictions', [])):
+                symbol = "✅" if result.get('prediction') == 1 else "❌"
+                print(f"[{i+1}/{num_requests}] Prédiction: {symbol} | "
+                      f"P(Good)={result.get('probability_good_credit'):.2%} | "
+                      f"Risk={result.get('risk_level')}")
+                successful += 1
         else:
+            print(f"❌ Batch échoué: {response.status_code}")
+            print(f"   {response.text}")
+            
+    except Exception as e:
+        print(f"❌ Erreur batch: {e}")
+    
+    failed = num_requests - successful
+    
+    print("\n" + "=" * 60)
+    print(f"📊 Résultats: {successful} succès, {failed} échecs")
+    print("=" * 60)
+    
+    return successful, failed
+
+
+async def run_load_test_async(num_requests: int = 20, concurrency: int = 16):
+    """Teste avec plusieurs prédictions simples envoyées en parallèle (client async httpx)"""
+    # Import local: httpx n'est requis que pour ce test
+    import httpx
+    
+    print(f"\n⚡ Exécution de {num_requests} prédictions simples concurrentes "
+          f"({concurrency} max en parallèle)...")
+    print("-" * 60)
+    
+    # Limite le nombre de requêtes en vol pour ne pas saturer l'API
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def post_prediction(client: httpx.AsyncClient, application: Dict[str, Any]):
+        async with semaphore:
+            return await client.post("/api/predict", json=application)
+    
+    async with httpx.AsyncClient(base_url=API_BASE_URL, timeout=10) as client:
+        responses = await asyncio.gather(
+            *[post_prediction(client, random.choice(SAMPLE_CREDIT_APPLICATIONS))
+              for _ in range(num_requests)],
+            return_exceptions=True
+        )
+    
+    successful = 0
+    failed = 0
+    
+    for response in responses:
+        if isinstance(response, Exception):
+            print(f"❌ Erreur prédiction: {response}")
             failed += 1
-        
-        if i < num_requests - 1:
-            time.sleep(delay)
+        elif response.status_code != 200:
+            print(f"❌ Prédiction échouée: {response.status_code}")
+            failed += 1
+        else:
+            successful += 1
     
     print("\n" + "=" * 60)
     print(f"📊 Résultats: {successful} succès, {failed} échecs")
@@ -251,9 +312,17 @@ def main():
     
     print("\n4️⃣  Test de charge (génération de métriques)...")
     print("-" * 60)
-    successful, failed = run_load_test(num_requests=5, delay=1.0)
+    successful, failed = run_load_test(num_requests=5)
+    
+    print("\n5️⃣  Test de charge concurrent (prédictions simples)...")
+    print("-" * 60)
+    try:
+        asyncio.run(run_load_test_async(num_requests=20))
+    except ImportError:
+        # httpx n'est pas une dépendance de l'API (requirement.txt)
+        print("⚠️  httpx non installé, test concurrent ignoré (pip install httpx)")
     
-    print("\n5️⃣  Récupération des métriques Prometheus...")
+    print("\n6️⃣  Récupération des métriques Prometheus...")
     print("-" * 60)
     get_metrics()
     